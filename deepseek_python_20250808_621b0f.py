@@ -2,9 +2,18 @@ import pandas as pd
 import numpy as np
 import streamlit as st
 from datetime import datetime
-from fuzzywuzzy import fuzz, process
+from functools import lru_cache
 from io import BytesIO
-import base64
+import pyarrow as pa
+from pyarrow import csv as pa_csv
+
+# RapidFuzz is the fast path for name scoring; without it, fall back to a
+# Numba-compiled similarity kernel over integer-encoded names
+try:
+    from rapidfuzz import fuzz, process
+    HAVE_RAPIDFUZZ = True
+except ImportError:
+    HAVE_RAPIDFUZZ = False
 
 # Configure Streamlit page
 st.set_page_config(
@@ -114,6 +123,151 @@ def apply_dark_theme():
 
 apply_dark_theme()
 
+# Common abbreviations: canonical name -> known aliases
+ABBREVIATIONS = {
+    "RELIANCE": ["RIL", "RELIANCE IND", "RELIANCE INDUSTRIES"],
+    "MAHARASHTRA BANK": ["MAHABANK", "BANK OF MAHARASHTRA"],
+    "HDFC BANK": ["HDFCBANK"],
+    "LIC": ["LIFE INSURANCE CORP"]
+}
+
+# Flat alias -> canonical map, applied to clean names at load time
+CANONICAL_NAMES = {
+    alias: key
+    for key, aliases in ABBREVIATIONS.items()
+    for alias in aliases
+}
+
+# Columns emitted for every match record, in report order
+MATCH_COLUMNS = [
+    'Stock Name (AIS)', 'Stock Name (CG)',
+    'Quantity (AIS)', 'Quantity (CG)',
+    'Sales Value (AIS)', 'Sales Value (CG)',
+    'Sale Date (AIS)', 'Sale Date (CG)',
+    'Purchase Value (AIS)', 'Purchase Value (CG)',
+    'Purchase Date (AIS)', 'Purchase Date (CG)'
+]
+
+# Output dtype per match column, used to preallocate result buffers
+MATCH_COLUMN_DTYPES = {
+    col: ('datetime64[ns]' if 'Date' in col else object if 'Name' in col else np.float64)
+    for col in MATCH_COLUMNS
+}
+
+if not HAVE_RAPIDFUZZ:
+    from numba import njit, prange
+
+    @njit(cache=True)
+    def _similarity(a, b):
+        """Normalized Levenshtein similarity (0-100) over two code arrays"""
+        la, lb = len(a), len(b)
+        if la == 0 or lb == 0:
+            return 0
+        prev = np.arange(lb + 1)
+        curr = np.empty(lb + 1, dtype=np.int64)
+        for i in range(1, la + 1):
+            curr[0] = i
+            for j in range(1, lb + 1):
+                cost = 0 if a[i - 1] == b[j - 1] else 1
+                curr[j] = min(prev[j] + 1, curr[j - 1] + 1, prev[j - 1] + cost)
+            prev, curr = curr, prev
+        dist = prev[lb]
+        longer = la if la > lb else lb
+        return int(round(100.0 * (1.0 - dist / longer)))
+
+    @njit(parallel=True, cache=True)
+    def _similarity_matrix(flat_a, off_a, flat_b, off_b):
+        """Pairwise similarity over CSR-encoded name lists, zeroed below 80"""
+        n_a = len(off_a) - 1
+        n_b = len(off_b) - 1
+        out = np.zeros((n_a, n_b), dtype=np.uint8)
+        for i in prange(n_a):
+            a = flat_a[off_a[i]:off_a[i + 1]]
+            for j in range(n_b):
+                score = _similarity(a, flat_b[off_b[j]:off_b[j + 1]])
+                if score >= 80:
+                    out[i, j] = score
+        return out
+
+def _encode_names(names):
+    """Names as one contiguous int32 code buffer plus offsets (CSR layout).
+
+    Codes are sorted within each name so the fallback scorer is word-order
+    insensitive, approximating token_set_ratio.
+    """
+    offsets = np.zeros(len(names) + 1, dtype=np.int64)
+    for i, name in enumerate(names):
+        offsets[i + 1] = offsets[i] + len(name)
+    flat = np.empty(offsets[-1], dtype=np.int32)
+    for i, name in enumerate(names):
+        flat[offsets[i]:offsets[i + 1]] = np.sort(np.array([ord(c) for c in name], dtype=np.int32))
+    return flat, offsets
+
+def _score_matrix(names_a, names_b):
+    """(len(a), len(b)) uint8 score matrix, zeroed below the 80 cutoff"""
+    if HAVE_RAPIDFUZZ:
+        return process.cdist(
+            names_a, names_b,
+            scorer=fuzz.token_set_ratio,
+            score_cutoff=80,
+            workers=-1,
+            dtype=np.uint8
+        )
+    flat_a, off_a = _encode_names(names_a)
+    flat_b, off_b = _encode_names(names_b)
+    return _similarity_matrix(flat_a, off_a, flat_b, off_b)
+
+def _column_values(frame, col, fill):
+    """Column as a NumPy array, or a fill-valued array when absent"""
+    if col in frame.columns:
+        return frame[col].to_numpy()
+    return np.full(len(frame), fill)
+
+# Low 48 bits of a name fingerprint hold its character bloom filter
+_BLOOM_MASK = (1 << 48) - 1
+
+@lru_cache(maxsize=None)
+def _fingerprint(name):
+    """Length, first letter and character bloom packed into one int"""
+    bloom = 0
+    for ch in name:
+        bloom |= 1 << (ord(ch) % 48)
+    first = ord(name[0]) if name else 0
+    return (len(name) << 56) | ((first & 0xFF) << 48) | bloom
+
+@lru_cache(maxsize=None)
+def _ngram_set(name):
+    """Hashed 5-gram set for a stock name, built once per unique name"""
+    return frozenset(hash(name[i:i+5]) for i in range(len(name) - 4))
+
+@lru_cache(maxsize=None)
+def fuzzy_match_stocks(name1, name2):
+    """Intelligent fuzzy matching for stock names"""
+    # Exact match
+    if name1 == name2:
+        return 100
+
+    # Common substring match (at least 5 consecutive characters): two names
+    # share such a substring exactly when their 5-gram sets intersect
+    if len(name1) >= 5 and len(name2) >= 5:
+        if not _ngram_set(name1).isdisjoint(_ngram_set(name2)):
+            return 90
+
+    # Fingerprint prefilter: names sharing fewer than half of the rarer
+    # name's character bits cannot come near the match cutoffs, so the
+    # Levenshtein call is skipped on a couple of int ops
+    bloom1 = _fingerprint(name1) & _BLOOM_MASK
+    bloom2 = _fingerprint(name2) & _BLOOM_MASK
+    if 2 * (bloom1 & bloom2).bit_count() < min(bloom1.bit_count(), bloom2.bit_count()):
+        return 0
+
+    # Fuzzy matching; token_set_ratio returns a float, round it back to
+    # the integer scores the report strings expect
+    if HAVE_RAPIDFUZZ:
+        return int(round(fuzz.token_set_ratio(name1, name2)))
+    flat, offsets = _encode_names([name1, name2])
+    return _similarity(flat[offsets[0]:offsets[1]], flat[offsets[1]:offsets[2]])
+
 # Reconciliation Engine
 class RecoBuddy:
     def __init__(self):
@@ -132,7 +286,25 @@ class RecoBuddy:
         # Preprocess stock names
         self.ais_data['Stock Name Clean'] = self.ais_data['Stock Name (AIS)'].str.upper().str.strip()
         self.cg_data['Stock Name Clean'] = self.cg_data['Stock Name (CG)'].str.upper().str.strip()
-        
+
+        # Collapse known aliases to their canonical names up front, so alias
+        # pairs already match by plain equality in Levels 1 and 2
+        self.ais_data['Stock Name Clean'] = self.ais_data['Stock Name Clean'].map(
+            lambda s: CANONICAL_NAMES.get(s, s)
+        )
+        self.cg_data['Stock Name Clean'] = self.cg_data['Stock Name Clean'].map(
+            lambda s: CANONICAL_NAMES.get(s, s)
+        )
+
+        # Share one category dtype across both frames so the joins and
+        # groupbys on clean names compare integer codes, not Python strings
+        stock_cat = pd.CategoricalDtype(sorted(
+            set(self.ais_data['Stock Name Clean'].dropna()) |
+            set(self.cg_data['Stock Name Clean'].dropna())
+        ))
+        self.ais_data['Stock Name Clean'] = self.ais_data['Stock Name Clean'].astype(stock_cat)
+        self.cg_data['Stock Name Clean'] = self.cg_data['Stock Name Clean'].astype(stock_cat)
+
         # Convert dates to datetime
         date_cols_ais = ['Sale Date (AIS)', 'Purchase Date (AIS)']
         date_cols_cg = ['Sale Date (CG)', 'Purchase Date (CG)']
@@ -144,247 +316,305 @@ class RecoBuddy:
         for col in date_cols_cg:
             if col in self.cg_data.columns:
                 self.cg_data[col] = pd.to_datetime(self.cg_data[col], errors='coerce')
-        
+
+        # Integer sale-day keys: the Level 1 date-tolerance join compares
+        # int64 days instead of allocating Timedelta intermediates
+        self.ais_data['_sale_day'] = (
+            self.ais_data['Sale Date (AIS)'].to_numpy(dtype='datetime64[D]').astype(np.int64)
+        )
+        self.cg_data['_sale_day'] = (
+            self.cg_data['Sale Date (CG)'].to_numpy(dtype='datetime64[D]').astype(np.int64)
+        )
+
         # Convert quantities and values to numeric
         num_cols = ['Quantity (AIS)', 'Quantity (CG)', 'Sales Value (AIS)', 
                    'Sales Value (CG)', 'Purchase Value (AIS)', 'Purchase Value (CG)']
         
+        # Downcast to the narrowest dtype that fits: the groupby/merge passes
+        # over these columns are memory-bandwidth-bound
         for col in num_cols:
+            downcast = 'integer' if col.startswith('Quantity') else 'float'
             if col in self.ais_data.columns:
-                self.ais_data[col] = pd.to_numeric(self.ais_data[col], errors='coerce')
+                self.ais_data[col] = pd.to_numeric(self.ais_data[col], errors='coerce', downcast=downcast)
             if col in self.cg_data.columns:
-                self.cg_data[col] = pd.to_numeric(self.cg_data[col], errors='coerce')
-        
+                self.cg_data[col] = pd.to_numeric(self.cg_data[col], errors='coerce', downcast=downcast)
+
+        # Shared quantity key for the matching merges, built from the
+        # converted columns so pasted string input still joins. The
+        # downcast is per-column, so the two sides can land on different
+        # dtypes (e.g. int8 vs float32) -- promote to a common one.
+        qty_dtype = np.promote_types(self.ais_data['Quantity (AIS)'].dtype,
+                                     self.cg_data['Quantity (CG)'].dtype)
+        self.ais_data['_qty'] = self.ais_data['Quantity (AIS)'].astype(qty_dtype)
+        self.cg_data['_qty'] = self.cg_data['Quantity (CG)'].astype(qty_dtype)
+
         # Create unique IDs for matching
-        self.ais_data['ID'] = range(1, len(self.ais_data) + 1
+        self.ais_data['ID'] = range(1, len(self.ais_data) + 1)
         self.cg_data['ID'] = range(1, len(self.cg_data) + 1)
     
-    def fuzzy_match_stocks(self, name1, name2):
-        """Intelligent fuzzy matching for stock names"""
-        # Exact match
-        if name1 == name2:
-            return 100
-        
-        # Common substring match (at least 5 consecutive characters)
-        if len(name1) >= 5 and len(name2) >= 5:
-            for i in range(len(name1) - 4):
-                substring = name1[i:i+5]
-                if substring in name2:
-                    return 90
-        
-        # Common abbreviations
-        abbreviations = {
-            "RELIANCE": ["RIL", "RELIANCE IND", "RELIANCE INDUSTRIES"],
-            "MAHARASHTRA BANK": ["MAHABANK", "BANK OF MAHARASHTRA"],
-            "HDFC BANK": ["HDFCBANK"],
-            "LIC": ["LIFE INSURANCE CORP"]
-        }
-        
-        for key, values in abbreviations.items():
-            if name1 == key and name2 in values:
-                return 95
-            if name2 == key and name1 in values:
-                return 95
-        
-        # Fuzzy matching
-        return fuzz.token_set_ratio(name1, name2)
-    
+    def build_match_frame(self, merged, match_type):
+        """Build a block of match records from a merged AIS/CG frame"""
+        frame = pd.DataFrame({
+            col: (merged[col].values if col in merged.columns else None)
+            for col in MATCH_COLUMNS
+        })
+        frame.insert(0, 'Match Type', match_type)
+        return frame
+
     def match_records(self):
         """Intelligent matching logic with multiple levels"""
-        # Prepare data
-        ais_df = self.ais_data.copy()
-        cg_df = self.cg_data.copy()
-        
-        # Add match columns
-        ais_df['Match ID'] = None
-        ais_df['Match Type'] = None
-        cg_df['Match ID'] = None
-        cg_df['Match Type'] = None
-        
-        # Create a copy for unmatched records
-        unmatched_ais = ais_df.copy()
-        unmatched_cg = cg_df.copy()
-        
-        # Results storage
-        matches = []
-        match_id = 1
-        
+        # No copies here: load_data already owns private frames, and matching
+        # only ever slices them into new unmatched views
+        unmatched_ais = self.ais_data
+        unmatched_cg = self.cg_data
+
+        # Matched rows tracked as positional boolean masks over the loaded
+        # frames: IDs run 1..N, so row ID k sits at position k-1. Marking a
+        # match is an O(1) bit flip and each level rebuilds its unmatched
+        # frame with one vectorized mask instead of hashing IDs through isin
+        ais_matched_mask = np.zeros(len(self.ais_data), dtype=bool)
+        cg_matched_mask = np.zeros(len(self.cg_data), dtype=bool)
+
+        # Results storage: one frame of match records per level
+        level_frames = []
+
         # Level 1: Exact match on name, quantity, and sale date (within 1 day)
-        for _, ais_row in unmatched_ais.iterrows():
-            if pd.isna(ais_row['Sale Date (AIS)']):
-                continue
-                
-            mask = (
-                (unmatched_cg['Stock Name Clean'] == ais_row['Stock Name Clean']) &
-                (unmatched_cg['Quantity (CG)'] == ais_row['Quantity (AIS)']) &
-                (abs(unmatched_cg['Sale Date (CG)'] - ais_row['Sale Date (AIS)']) <= pd.Timedelta(days=1))
+        # merge_asof pairs each AIS row with the nearest-dated CG row sharing
+        # name and quantity in a single C-level join on int64 day keys
+        # The merges treat NaN join keys as equal, so blank rows (e.g. empty
+        # data_editor leftovers) must be kept out of the join inputs
+        ais_keyed = unmatched_ais['Stock Name Clean'].notna() & unmatched_ais['_qty'].notna()
+        cg_keyed = unmatched_cg['Stock Name Clean'].notna() & unmatched_cg['_qty'].notna()
+
+        left = unmatched_ais[ais_keyed & unmatched_ais['Sale Date (AIS)'].notna()].sort_values('_sale_day')
+        right = unmatched_cg[cg_keyed & unmatched_cg['Sale Date (CG)'].notna()].sort_values('_sale_day')
+
+        if not left.empty and not right.empty:
+            merged = pd.merge_asof(
+                left, right,
+                on='_sale_day',
+                by=['Stock Name Clean', '_qty'],
+                tolerance=1,
+                direction='nearest',
+                suffixes=('_ais', '_cg')
             )
-            
-            matches_found = unmatched_cg[mask]
-            
-            if not matches_found.empty:
-                cg_row = matches_found.iloc[0]
-                
-                # Create match record
-                match_record = {
-                    'Match ID': match_id,
-                    'Match Type': 'Level 1 (Exact Name, Qty, Date)',
-                    'Stock Name (AIS)': ais_row['Stock Name (AIS)'],
-                    'Stock Name (CG)': cg_row['Stock Name (CG)'],
-                    'Quantity (AIS)': ais_row['Quantity (AIS)'],
-                    'Quantity (CG)': cg_row['Quantity (CG)'],
-                    'Sales Value (AIS)': ais_row['Sales Value (AIS)'],
-                    'Sales Value (CG)': cg_row['Sales Value (CG)'],
-                    'Sale Date (AIS)': ais_row['Sale Date (AIS)'],
-                    'Sale Date (CG)': cg_row['Sale Date (CG)'],
-                    'Purchase Value (AIS)': ais_row.get('Purchase Value (AIS)', None),
-                    'Purchase Value (CG)': cg_row.get('Purchase Value (CG)', None),
-                    'Purchase Date (AIS)': ais_row.get('Purchase Date (AIS)', None),
-                    'Purchase Date (CG)': cg_row.get('Purchase Date (CG)', None)
-                }
-                matches.append(match_record)
-                
-                # Update dataframes
-                unmatched_ais = unmatched_ais[unmatched_ais['ID'] != ais_row['ID']]
-                unmatched_cg = unmatched_cg[unmatched_cg['ID'] != cg_row['ID']]
-                match_id += 1
-        
-        # Level 2: Exact name and quantity (ignore date)
-        for _, ais_row in unmatched_ais.iterrows():
-            mask = (
-                (unmatched_cg['Stock Name Clean'] == ais_row['Stock Name Clean']) &
-                (unmatched_cg['Quantity (CG)'] == ais_row['Quantity (AIS)'])
+
+            # Keep only actual matches and let each CG row be used once
+            merged = merged[merged['ID_cg'].notna()].drop_duplicates('ID_cg')
+
+            if not merged.empty:
+                level_frames.append(self.build_match_frame(merged, 'Level 1 (Exact Name, Qty, Date)'))
+
+                # Remove matched rows in a single pass
+                ais_matched_mask[merged['ID_ais'].to_numpy(np.int64) - 1] = True
+                cg_matched_mask[merged['ID_cg'].to_numpy(np.int64) - 1] = True
+                unmatched_ais = self.ais_data[~ais_matched_mask]
+                unmatched_cg = self.cg_data[~cg_matched_mask]
+
+        # Level 2: Exact name and quantity (ignore date) via a single hash join
+        if not unmatched_ais.empty and not unmatched_cg.empty:
+            ais_keyed = unmatched_ais['Stock Name Clean'].notna() & unmatched_ais['_qty'].notna()
+            cg_keyed = unmatched_cg['Stock Name Clean'].notna() & unmatched_cg['_qty'].notna()
+            merged = pd.merge(
+                unmatched_ais[ais_keyed], unmatched_cg[cg_keyed],
+                on=['Stock Name Clean', '_qty'],
+                how='inner',
+                suffixes=('_ais', '_cg')
             )
-            
-            matches_found = unmatched_cg[mask]
-            
-            if not matches_found.empty:
-                cg_row = matches_found.iloc[0]
-                
-                match_record = {
-                    'Match ID': match_id,
-                    'Match Type': 'Level 2 (Exact Name, Qty)',
-                    'Stock Name (AIS)': ais_row['Stock Name (AIS)'],
-                    'Stock Name (CG)': cg_row['Stock Name (CG)'],
-                    'Quantity (AIS)': ais_row['Quantity (AIS)'],
-                    'Quantity (CG)': cg_row['Quantity (CG)'],
-                    'Sales Value (AIS)': ais_row['Sales Value (AIS)'],
-                    'Sales Value (CG)': cg_row['Sales Value (CG)'],
-                    'Sale Date (AIS)': ais_row['Sale Date (AIS)'],
-                    'Sale Date (CG)': cg_row['Sale Date (CG)'],
-                    'Purchase Value (AIS)': ais_row.get('Purchase Value (AIS)', None),
-                    'Purchase Value (CG)': cg_row.get('Purchase Value (CG)', None),
-                    'Purchase Date (AIS)': ais_row.get('Purchase Date (AIS)', None),
-                    'Purchase Date (CG)': cg_row.get('Purchase Date (CG)', None)
-                }
-                matches.append(match_record)
-                
-                unmatched_ais = unmatched_ais[unmatched_ais['ID'] != ais_row['ID']]
-                unmatched_cg = unmatched_cg[unmatched_cg['ID'] != cg_row['ID']]
-                match_id += 1
-        
+
+            # First CG candidate per AIS row, each CG row used once
+            merged = merged.drop_duplicates('ID_ais').drop_duplicates('ID_cg')
+
+            if not merged.empty:
+                level_frames.append(self.build_match_frame(merged, 'Level 2 (Exact Name, Qty)'))
+
+                ais_matched_mask[merged['ID_ais'].to_numpy(np.int64) - 1] = True
+                cg_matched_mask[merged['ID_cg'].to_numpy(np.int64) - 1] = True
+                unmatched_ais = self.ais_data[~ais_matched_mask]
+                unmatched_cg = self.cg_data[~cg_matched_mask]
+
         # Level 3: Fuzzy name match with quantity match
-        for _, ais_row in unmatched_ais.iterrows():
-            # Find best fuzzy match
-            best_match = None
-            best_score = 0
-            
-            for _, cg_row in unmatched_cg.iterrows():
-                score = self.fuzzy_match_stocks(
-                    ais_row['Stock Name Clean'], 
-                    cg_row['Stock Name Clean']
-                )
-                
-                if score > 80 and cg_row['Quantity (CG)'] == ais_row['Quantity (AIS)'] and score > best_score:
-                    best_score = score
-                    best_match = cg_row
-            
-            if best_match is not None:
-                match_record = {
-                    'Match ID': match_id,
-                    'Match Type': f'Level 3 (Fuzzy Name: {best_score}%, Qty)',
-                    'Stock Name (AIS)': ais_row['Stock Name (AIS)'],
-                    'Stock Name (CG)': best_match['Stock Name (CG)'],
-                    'Quantity (AIS)': ais_row['Quantity (AIS)'],
-                    'Quantity (CG)': best_match['Quantity (CG)'],
-                    'Sales Value (AIS)': ais_row['Sales Value (AIS)'],
-                    'Sales Value (CG)': best_match['Sales Value (CG)'],
-                    'Sale Date (AIS)': ais_row['Sale Date (AIS)'],
-                    'Sale Date (CG)': best_match['Sale Date (CG)'],
-                    'Purchase Value (AIS)': ais_row.get('Purchase Value (AIS)', None),
-                    'Purchase Value (CG)': best_match.get('Purchase Value (CG)', None),
-                    'Purchase Date (AIS)': ais_row.get('Purchase Date (AIS)', None),
-                    'Purchase Date (CG)': best_match.get('Purchase Date (CG)', None)
-                }
-                matches.append(match_record)
-                
-                unmatched_ais = unmatched_ais[unmatched_ais['ID'] != ais_row['ID']]
-                unmatched_cg = unmatched_cg[unmatched_cg['ID'] != best_match['ID']]
-                match_id += 1
-        
+        # Quantity is a hard constraint, so block on it: fuzzy scores are only
+        # computed between AIS and CG rows that share a quantity, shrinking the
+        # pair count from N*M to the sum of the per-quantity block products
+        if not unmatched_ais.empty and not unmatched_cg.empty:
+            ais_names = unmatched_ais['Stock Name Clean'].to_numpy(dtype=object)
+            cg_names = unmatched_cg['Stock Name Clean'].to_numpy(dtype=object)
+            ais_ids = unmatched_ais['ID'].to_numpy()
+            cg_ids = unmatched_cg['ID'].to_numpy()
+
+            # Materialize every column the match loop reads once up front;
+            # positional array indexing replaces per-row Series construction
+            ais_name = unmatched_ais['Stock Name (AIS)'].to_numpy()
+            cg_name = unmatched_cg['Stock Name (CG)'].to_numpy()
+            ais_qty = unmatched_ais['Quantity (AIS)'].to_numpy()
+            cg_qty = unmatched_cg['Quantity (CG)'].to_numpy()
+            ais_sales = unmatched_ais['Sales Value (AIS)'].to_numpy()
+            cg_sales = unmatched_cg['Sales Value (CG)'].to_numpy()
+            ais_sale_date = unmatched_ais['Sale Date (AIS)'].to_numpy()
+            cg_sale_date = unmatched_cg['Sale Date (CG)'].to_numpy()
+            ais_pur_value = _column_values(unmatched_ais, 'Purchase Value (AIS)', np.nan)
+            cg_pur_value = _column_values(unmatched_cg, 'Purchase Value (CG)', np.nan)
+            ais_pur_date = _column_values(unmatched_ais, 'Purchase Date (AIS)', np.datetime64('NaT'))
+            cg_pur_date = _column_values(unmatched_cg, 'Purchase Date (CG)', np.datetime64('NaT'))
+
+            matched_ais = np.zeros(len(unmatched_ais), dtype=bool)
+            matched_cg = np.zeros(len(unmatched_cg), dtype=bool)
+
+            # Positional row indices per quantity on each side
+            ais_by_qty = unmatched_ais.groupby('_qty').indices
+            cg_by_qty = unmatched_cg.groupby('_qty').indices
+
+            # Preallocate one typed output buffer per column (SoA) instead of
+            # growing a list of per-row dicts and re-inferring dtypes at the end
+            max_matches = min(len(unmatched_ais), len(unmatched_cg))
+            out_cols = {'Match Type': np.empty(max_matches, dtype=object)}
+            for col in MATCH_COLUMNS:
+                out_cols[col] = np.empty(max_matches, dtype=MATCH_COLUMN_DTYPES[col])
+            out_order = np.empty(max_matches, dtype=np.int64)
+            n_matches = 0
+
+            for qty, ais_idx in ais_by_qty.items():
+                cg_idx = cg_by_qty.get(qty)
+                if cg_idx is None:
+                    continue
+
+                scores = _score_matrix(ais_names[ais_idx], cg_names[cg_idx])
+
+                # Best CG pick per AIS row straight off the score matrix;
+                # blocks are disjoint by quantity so no cross-block conflicts
+                best_m = scores.argmax(axis=1)
+                best_score = scores[np.arange(len(ais_idx)), best_m]
+                valid = best_score > 80
+                if not valid.any():
+                    continue
+
+                # When several AIS rows pick the same CG row, the highest
+                # score wins and ties go to the earlier AIS row; sort on
+                # the negated scores (uint8, so cast first) to keep the
+                # stable order instead of reversing it
+                by_score = np.argsort(-best_score[valid].astype(np.int16), kind='stable')
+                cand_i = ais_idx[valid][by_score]
+                cand_m = best_m[valid][by_score]
+                cand_score = best_score[valid][by_score]
+                _, first = np.unique(cand_m, return_index=True)
+
+                sel_i = cand_i[first]
+                sel_j = cg_idx[cand_m[first]]
+                sel_score = cand_score[first]
+
+                count = len(sel_i)
+                sl = slice(n_matches, n_matches + count)
+                out_cols['Match Type'][sl] = [f'Level 3 (Fuzzy Name: {s}%, Qty)' for s in sel_score]
+                out_cols['Stock Name (AIS)'][sl] = ais_name[sel_i]
+                out_cols['Stock Name (CG)'][sl] = cg_name[sel_j]
+                out_cols['Quantity (AIS)'][sl] = ais_qty[sel_i]
+                out_cols['Quantity (CG)'][sl] = cg_qty[sel_j]
+                out_cols['Sales Value (AIS)'][sl] = ais_sales[sel_i]
+                out_cols['Sales Value (CG)'][sl] = cg_sales[sel_j]
+                out_cols['Sale Date (AIS)'][sl] = ais_sale_date[sel_i]
+                out_cols['Sale Date (CG)'][sl] = cg_sale_date[sel_j]
+                out_cols['Purchase Value (AIS)'][sl] = ais_pur_value[sel_i]
+                out_cols['Purchase Value (CG)'][sl] = cg_pur_value[sel_j]
+                out_cols['Purchase Date (AIS)'][sl] = ais_pur_date[sel_i]
+                out_cols['Purchase Date (CG)'][sl] = cg_pur_date[sel_j]
+                out_order[sl] = sel_i
+                n_matches += count
+
+                matched_ais[sel_i] = True
+                matched_cg[sel_j] = True
+
+            if n_matches:
+                # Keep report rows in AIS input order despite the blocked iteration
+                order = np.argsort(out_order[:n_matches], kind='stable')
+                level_frames.append(pd.DataFrame({
+                    col: arr[:n_matches][order] for col, arr in out_cols.items()
+                }))
+
+            ais_matched_mask[ais_ids[matched_ais] - 1] = True
+            cg_matched_mask[cg_ids[matched_cg] - 1] = True
+            unmatched_ais = self.ais_data[~ais_matched_mask]
+            unmatched_cg = self.cg_data[~cg_matched_mask]
+
         # Level 4: Aggregate quantity matching for same stock
-        # Group unmatched records by stock name
-        ais_groups = unmatched_ais.groupby('Stock Name Clean')
-        cg_groups = unmatched_cg.groupby('Stock Name Clean')
-        
-        for stock_name, ais_group in ais_groups:
-            # Find matching CG stock group using fuzzy matching
-            cg_match_name = None
-            best_score = 0
-            
-            for cg_stock in cg_groups.groups.keys():
-                score = self.fuzzy_match_stocks(stock_name, cg_stock)
-                if score > 85 and score > best_score:
-                    best_score = score
-                    cg_match_name = cg_stock
-            
-            if cg_match_name:
-                cg_group = cg_groups.get_group(cg_match_name)
-                
-                # Check if total quantities match
-                ais_total_qty = ais_group['Quantity (AIS)'].sum()
-                cg_total_qty = cg_group['Quantity (CG)'].sum()
-                
-                if ais_total_qty == cg_total_qty:
-                    # Create a single match record for the aggregated values
-                    match_record = {
-                        'Match ID': match_id,
-                        'Match Type': f'Level 4 (Aggregate: {best_score}%)',
-                        'Stock Name (AIS)': ', '.join(ais_group['Stock Name (AIS)'].unique()),
-                        'Stock Name (CG)': ', '.join(cg_group['Stock Name (CG)'].unique()),
-                        'Quantity (AIS)': ais_total_qty,
-                        'Quantity (CG)': cg_total_qty,
-                        'Sales Value (AIS)': ais_group['Sales Value (AIS)'].sum(),
-                        'Sales Value (CG)': cg_group['Sales Value (CG)'].sum(),
-                        'Sale Date (AIS)': "Multiple",
-                        'Sale Date (CG)': "Multiple",
-                        'Purchase Value (AIS)': ais_group.get('Purchase Value (AIS)', 0).sum(),
-                        'Purchase Value (CG)': cg_group.get('Purchase Value (CG)', 0).sum(),
-                        'Purchase Date (AIS)': "Multiple",
-                        'Purchase Date (CG)': "Multiple"
-                    }
-                    matches.append(match_record)
-                    
+        # Aggregate both sides per stock name in C, then join on the
+        # fuzzy-resolved name and keep stocks whose total quantities agree
+        if not unmatched_ais.empty and not unmatched_cg.empty:
+            ais_aggs = {
+                'Stock Name (AIS)': ('Stock Name (AIS)', lambda s: ', '.join(s.unique())),
+                'Quantity (AIS)': ('Quantity (AIS)', 'sum'),
+                'Sales Value (AIS)': ('Sales Value (AIS)', 'sum'),
+            }
+            if 'Purchase Value (AIS)' in unmatched_ais.columns:
+                ais_aggs['Purchase Value (AIS)'] = ('Purchase Value (AIS)', 'sum')
+
+            cg_aggs = {
+                'Stock Name (CG)': ('Stock Name (CG)', lambda s: ', '.join(s.unique())),
+                'Quantity (CG)': ('Quantity (CG)', 'sum'),
+                'Sales Value (CG)': ('Sales Value (CG)', 'sum'),
+            }
+            if 'Purchase Value (CG)' in unmatched_cg.columns:
+                cg_aggs['Purchase Value (CG)'] = ('Purchase Value (CG)', 'sum')
+
+            ais_tot = unmatched_ais.groupby('Stock Name Clean', sort=False, observed=True).agg(**ais_aggs).reset_index()
+            # CG keys stay sorted so score ties resolve to the same stock
+            # the per-row loop used to pick
+            cg_tot = unmatched_cg.groupby('Stock Name Clean', observed=True).agg(**cg_aggs)
+
+            # Resolve each AIS stock to its best CG stock over the unique group
+            # keys (cached scores, far fewer pairs than rows)
+            best_cg = {}
+            best_scores = {}
+            for stock_name in ais_tot['Stock Name Clean']:
+                for cg_stock in cg_tot.index:
+                    score = fuzzy_match_stocks(stock_name, cg_stock)
+                    if score > 85 and score > best_scores.get(stock_name, 0):
+                        best_scores[stock_name] = score
+                        best_cg[stock_name] = cg_stock
+
+            if best_cg:
+                ais_tot['_cg_name'] = ais_tot['Stock Name Clean'].map(best_cg)
+                merged = ais_tot.merge(cg_tot, left_on='_cg_name', right_index=True)
+                merged = merged[merged['Quantity (AIS)'] == merged['Quantity (CG)']]
+                merged = merged.drop_duplicates('_cg_name')
+
+                if not merged.empty:
+                    merged = merged.assign(**{
+                        'Sale Date (AIS)': 'Multiple',
+                        'Sale Date (CG)': 'Multiple',
+                        'Purchase Date (AIS)': 'Multiple',
+                        'Purchase Date (CG)': 'Multiple'
+                    })
+                    match_types = [
+                        f'Level 4 (Aggregate: {best_scores[name]}%)'
+                        for name in merged['Stock Name Clean']
+                    ]
+                    level_frames.append(self.build_match_frame(merged, match_types))
+
                     # Remove matched records
-                    unmatched_ais = unmatched_ais[~unmatched_ais['ID'].isin(ais_group['ID'])]
-                    unmatched_cg = unmatched_cg[~unmatched_cg['ID'].isin(cg_group['ID'])]
-                    match_id += 1
-        
+                    ais_hit = unmatched_ais['Stock Name Clean'].isin(merged['Stock Name Clean'])
+                    cg_hit = unmatched_cg['Stock Name Clean'].isin(merged['_cg_name'])
+                    ais_matched_mask[unmatched_ais.loc[ais_hit, 'ID'].to_numpy() - 1] = True
+                    cg_matched_mask[unmatched_cg.loc[cg_hit, 'ID'].to_numpy() - 1] = True
+                    unmatched_ais = self.ais_data[~ais_matched_mask]
+                    unmatched_cg = self.cg_data[~cg_matched_mask]
+
         # Create final matched dataframe
-        if matches:
-            self.mapped_data = pd.DataFrame(matches)
-            
+        if level_frames:
+            self.mapped_data = pd.concat(level_frames, ignore_index=True)
+            self.mapped_data.insert(0, 'Match ID', range(1, len(self.mapped_data) + 1))
+
             # Calculate sales difference
             self.mapped_data['Sales Difference'] = (
-                self.mapped_data['Sales Value (AIS)'] - 
+                self.mapped_data['Sales Value (AIS)'] -
                 self.mapped_data['Sales Value (CG)']
             )
         else:
             self.mapped_data = pd.DataFrame()
-        
+
         # Store unmatched records
-        self.unmapped_ais = unmatched_ais.drop(columns=['Stock Name Clean', 'ID'])
-        self.unmapped_cg = unmatched_cg.drop(columns=['Stock Name Clean', 'ID'])
+        self.unmapped_ais = unmatched_ais.drop(columns=['Stock Name Clean', 'ID', '_qty', '_sale_day'])
+        self.unmapped_cg = unmatched_cg.drop(columns=['Stock Name Clean', 'ID', '_qty', '_sale_day'])
         
         # Create stock-wise totals
         self.create_stock_totals()
@@ -395,32 +625,64 @@ class RecoBuddy:
             self.stock_totals = pd.DataFrame()
             return
         
-        # Group by stock name
-        stock_groups = self.mapped_data.groupby('Stock Name (AIS)')
-        
-        stock_data = []
-        
-        for stock, group in stock_groups:
-            stock_data.append({
-                'Stock Name': stock,
-                'AIS Quantity': group['Quantity (AIS)'].sum(),
-                'CG Quantity': group['Quantity (CG)'].sum(),
-                'Quantity Difference': group['Quantity (AIS)'].sum() - group['Quantity (CG)'].sum(),
-                'AIS Sales': group['Sales Value (AIS)'].sum(),
-                'CG Sales': group['Sales Value (CG)'].sum(),
-                'Sales Difference': group['Sales Value (AIS)'].sum() - group['Sales Value (CG)'].sum(),
-                'Match Types': ', '.join(group['Match Type'].unique())
+        # One groupby.agg emits every aggregate in a single C-level pass
+        totals = (
+            self.mapped_data
+            .groupby('Stock Name (AIS)', observed=True)
+            .agg(**{
+                'AIS Quantity': ('Quantity (AIS)', 'sum'),
+                'CG Quantity': ('Quantity (CG)', 'sum'),
+                'AIS Sales': ('Sales Value (AIS)', 'sum'),
+                'CG Sales': ('Sales Value (CG)', 'sum'),
+                'Match Types': ('Match Type', lambda s: ', '.join(s.unique()))
             })
-        
-        self.stock_totals = pd.DataFrame(stock_data)
+            .reset_index()
+            .rename(columns={'Stock Name (AIS)': 'Stock Name'})
+        )
+
+        # Difference columns via vectorized subtraction, in report order
+        totals.insert(3, 'Quantity Difference', totals['AIS Quantity'] - totals['CG Quantity'])
+        totals.insert(6, 'Sales Difference', totals['AIS Sales'] - totals['CG Sales'])
+
+        self.stock_totals = totals
+
+# Cached entry point: Streamlit reruns the script on every widget
+# interaction, so repeat reconciliations of unchanged inputs are served
+# from cache instead of being recomputed
+@st.cache_data(hash_funcs={
+    pd.DataFrame: lambda df: hash(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+})
+def run_reconciliation(ais_df, cg_df):
+    """Run the full reconciliation, keyed on the content of both inputs"""
+    reconciler = RecoBuddy()
+    reconciler.load_data(ais_df, cg_df)
+    reconciler.match_records()
+    return (
+        reconciler.mapped_data,
+        reconciler.stock_totals,
+        reconciler.unmapped_ais,
+        reconciler.unmapped_cg
+    )
 
 # Helper function for download button
-def get_table_download_link(df, filename):
-    """Generates a link allowing the data in a given panda dataframe to be downloaded"""
-    csv = df.to_csv(index=False)
-    b64 = base64.b64encode(csv.encode()).decode()  # some strings <-> bytes conversions necessary here
-    href = f'<a href="data:file/csv;base64,{b64}" download="{filename}.csv">Download {filename}</a>'
-    return href
+def render_download_button(df, filename):
+    """Renders a download button serving the dataframe as CSV"""
+    # Arrow's multithreaded C++ CSV writer; mixed-type report columns
+    # (e.g. "Multiple" in date fields) fall back to pandas
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        buffer = BytesIO()
+        pa_csv.write_csv(table, buffer)
+        data = buffer.getvalue()
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        data = df.to_csv(index=False).encode()
+
+    st.download_button(
+        label=f"Download {filename}",
+        data=data,
+        file_name=f"{filename}.csv",
+        mime="text/csv"
+    )
 
 # Streamlit App
 def main():
@@ -453,8 +715,11 @@ def main():
     st.markdown('</div>', unsafe_allow_html=True)
     
     # Initialize session state
-    if 'reconciler' not in st.session_state:
-        st.session_state.reconciler = RecoBuddy()
+    if 'mapped_data' not in st.session_state:
+        st.session_state.mapped_data = None
+        st.session_state.stock_totals = None
+        st.session_state.unmapped_ais = None
+        st.session_state.unmapped_cg = None
     
     # Create two columns for data input
     col1, col2 = st.columns(2)
@@ -503,61 +768,57 @@ def main():
     if st.button("🚀 Reconcile Data", use_container_width=True):
         if not ais_data.empty and not cg_data.empty:
             with st.spinner("Reconciling data with intelligent mapping..."):
-                st.session_state.reconciler.load_data(ais_data, cg_data)
-                st.session_state.reconciler.match_records()
+                (st.session_state.mapped_data,
+                 st.session_state.stock_totals,
+                 st.session_state.unmapped_ais,
+                 st.session_state.unmapped_cg) = run_reconciliation(ais_data, cg_data)
             st.success("Reconciliation completed successfully!")
         else:
             st.error("Please provide data in both tables before reconciling")
     
     # Show reconciliation results
-    if st.session_state.reconciler.mapped_data is not None:
-        if not st.session_state.reconciler.mapped_data.empty:
+    if st.session_state.mapped_data is not None:
+        if not st.session_state.mapped_data.empty:
             st.markdown('<div class="card">', unsafe_allow_html=True)
             st.subheader("📊 Primary Reconciliation Report")
-            st.dataframe(st.session_state.reconciler.mapped_data, use_container_width=True)
+            st.dataframe(st.session_state.mapped_data, use_container_width=True)
             
             # Download button for primary report
-            st.markdown(get_table_download_link(
-                st.session_state.reconciler.mapped_data, 
-                "Primary_Reconciliation_Report"
-            ), unsafe_allow_html=True)
+            render_download_button(st.session_state.mapped_data, "Primary_Reconciliation_Report")
             st.markdown('</div>', unsafe_allow_html=True)
             
             # Secondary report (stock totals)
-            if not st.session_state.reconciler.stock_totals.empty:
+            if not st.session_state.stock_totals.empty:
                 st.markdown('<div class="card">', unsafe_allow_html=True)
                 st.subheader("📈 Stock-wise Totals Report")
-                st.dataframe(st.session_state.reconciler.stock_totals, use_container_width=True)
+                st.dataframe(st.session_state.stock_totals, use_container_width=True)
                 
                 # Download button for secondary report
-                st.markdown(get_table_download_link(
-                    st.session_state.reconciler.stock_totals, 
-                    "Stock_Totals_Report"
-                ), unsafe_allow_html=True)
+                render_download_button(st.session_state.stock_totals, "Stock_Totals_Report")
                 st.markdown('</div>', unsafe_allow_html=True)
         
         # Show unmatched records
         col_unmapped1, col_unmapped2 = st.columns(2)
         
         with col_unmapped1:
-            if not st.session_state.reconciler.unmapped_ais.empty:
+            if not st.session_state.unmapped_ais.empty:
                 st.markdown('<div class="card warning-box">', unsafe_allow_html=True)
                 st.subheader("⚠️ Unmatched AIS Records")
-                st.dataframe(st.session_state.reconciler.unmapped_ais, use_container_width=True)
+                st.dataframe(st.session_state.unmapped_ais, use_container_width=True)
                 st.markdown('</div>', unsafe_allow_html=True)
         
         with col_unmapped2:
-            if not st.session_state.reconciler.unmapped_cg.empty:
+            if not st.session_state.unmapped_cg.empty:
                 st.markdown('<div class="card warning-box">', unsafe_allow_html=True)
                 st.subheader("⚠️ Unmatched Broker Records")
-                st.dataframe(st.session_state.reconciler.unmapped_cg, use_container_width=True)
+                st.dataframe(st.session_state.unmapped_cg, use_container_width=True)
                 st.markdown('</div>', unsafe_allow_html=True)
         
         # Reconciliation summary
-        if not st.session_state.reconciler.mapped_data.empty:
-            total_matches = len(st.session_state.reconciler.mapped_data)
-            unmatched_ais = len(st.session_state.reconciler.unmapped_ais)
-            unmatched_cg = len(st.session_state.reconciler.unmapped_cg)
+        if not st.session_state.mapped_data.empty:
+            total_matches = len(st.session_state.mapped_data)
+            unmatched_ais = len(st.session_state.unmapped_ais)
+            unmatched_cg = len(st.session_state.unmapped_cg)
             
             st.markdown('<div class="card">', unsafe_allow_html=True)
             st.subheader("📝 Reconciliation Summary")
@@ -574,8 +835,8 @@ def main():
                 st.metric("Unmatched Broker Records", unmatched_cg)
             
             # Match type distribution
-            if 'Match Type' in st.session_state.reconciler.mapped_data:
-                match_counts = st.session_state.reconciler.mapped_data['Match Type'].value_counts()
+            if 'Match Type' in st.session_state.mapped_data:
+                match_counts = st.session_state.mapped_data['Match Type'].value_counts()
                 st.bar_chart(match_counts)
             
             st.markdown('</div>', unsafe_allow_html=True)